@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Concurrency Benchmark for Balance Coalescing
+Fires N concurrent balance requests at one group and measures the SQLite
+work they cause, with and without the coalescing layer
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+# Point the API at a scratch database before main runs init_db on import
+BENCH_DIR = tempfile.TemporaryDirectory()
+os.environ["EXPENSES_DB"] = os.path.join(BENCH_DIR.name, "bench.db")
+
+import main
+
+CALLER_COUNTS = [1, 2, 4, 8, 16, 32, 64]
+GROUP_ID = 1
+OTHER_GROUP_ID = 2
+MEMBER_IDS = [1, 2, 3]
+EXTRA_EXPENSES = 500
+OTHER_GROUP_EXPENSES = 2000
+
+# SQLite VM steps run on benchmark connections, split by what ran them
+vm_steps = {"scan": 0, "version": 0}
+vm_steps_lock = threading.Lock()
+current = threading.local()
+
+def count_vm_step():
+    """Count one SQLite VM step against the current bucket"""
+    with vm_steps_lock:
+        vm_steps[getattr(current, "bucket", "scan")] += 1
+    return 0
+
+def get_counting_db():
+    """Same as main.get_db, but counts every VM step"""
+    conn = sqlite3.connect(main.DB_FILE, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.set_progress_handler(count_vm_step, 1)
+    return conn
+
+get_group_version = main.get_group_version
+
+def get_counted_group_version(group_id: int) -> int:
+    """Same as main.get_group_version, but counts its steps separately"""
+    current.bucket = "version"
+    try:
+        return get_group_version(group_id)
+    finally:
+        current.bucket = "scan"
+
+def setup_db(db_file: str):
+    """Create a database with the sample data plus two busy groups"""
+    conn = sqlite3.connect(db_file)
+    schema_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schema.sql")
+    with open(schema_file, "r") as f:
+        conn.executescript(f.read())
+    for group_id, count in ((GROUP_ID, EXTRA_EXPENSES), (OTHER_GROUP_ID, OTHER_GROUP_EXPENSES)):
+        for i in range(count):
+            cursor = conn.execute(
+                "INSERT INTO expenses (group_id, paid_by, amount, description, created_at) VALUES (?, ?, ?, ?, ?)",
+                (group_id, 1, 10.0 + i, f"Expense {i}", "2025-09-27T12:00:00Z")
+            )
+            conn.execute(
+                "INSERT INTO expense_participants (expense_id, user_id) VALUES (?, ?)",
+                (cursor.lastrowid, 1)
+            )
+            conn.execute(
+                "INSERT INTO expense_participants (expense_id, user_id) VALUES (?, ?)",
+                (cursor.lastrowid, 2)
+            )
+    conn.commit()
+    conn.close()
+
+def run_callers(callers: int, call):
+    """Release `callers` threads at once and return (vm_steps, seconds)"""
+    barrier = threading.Barrier(callers)
+
+    def worker(i: int):
+        barrier.wait()
+        call(MEMBER_IDS[i % len(MEMBER_IDS)])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(callers)]
+    for bucket in vm_steps:
+        vm_steps[bucket] = 0
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return dict(vm_steps), time.perf_counter() - start
+
+def uncoalesced_call(user_id: int):
+    """Every caller scans the group on its own connection"""
+    main.compute_group_net_balances(GROUP_ID)
+
+def coalesced_call(user_id: int):
+    """Callers go through the coalescing layer"""
+    main.get_group_balance(GROUP_ID, user_id)
+
+def main_bench():
+    """Run a cold and a warm round for each caller count"""
+    print("🚀 Balance Coalescing Benchmark")
+    print("=" * 50)
+    print()
+
+    main.get_db = get_counting_db
+    main.get_group_version = get_counted_group_version
+    setup_db(main.DB_FILE)
+
+    print("VM steps per round; scan = balance computation, version = version lookups")
+    print(f"{'callers':>8} {'round':>6} {'uncoalesced_scan':>17} {'coalesced_scan':>15} "
+          f"{'version':>8} {'hits':>5} {'misses':>7} {'coalesced':>10} {'ms':>8}")
+    cold_scans = []
+    warm_scans = []
+    for callers in CALLER_COUNTS:
+        baseline, _ = run_callers(callers, uncoalesced_call)
+
+        # A fresh coalescer so the cold round has to compute once
+        main.balance_coalescer = main.BalanceCoalescer()
+        for round_name in ("cold", "warm"):
+            before = main.balance_coalescer.stats()
+            steps, seconds = run_callers(callers, coalesced_call)
+            after = main.balance_coalescer.stats()
+            delta = {k: after[k] - before[k] for k in after}
+            (cold_scans if round_name == "cold" else warm_scans).append(steps["scan"])
+
+            uncoalesced = baseline["scan"] if round_name == "cold" else "-"
+            print(f"{callers:>8} {round_name:>6} {uncoalesced:>17} {steps['scan']:>15} "
+                  f"{steps['version']:>8} {delta['hits']:>5} {delta['misses']:>7} "
+                  f"{delta['coalesced']:>10} {seconds * 1000:>8.1f}")
+
+    print()
+    print("=" * 50)
+    flat = len(set(cold_scans)) == 1 and not any(warm_scans)
+    status = "✅ PASS" if flat else "❌ FAIL"
+    print(f"{status} Coalesced scan work is flat and warm rounds skip the scan")
+
+if __name__ == "__main__":
+    try:
+        main_bench()
+    finally:
+        BENCH_DIR.cleanup()
@@ -5,6 +5,7 @@ from typing import List, Dict, Optional
 import sqlite3
 import datetime
 import os
+import threading
 
 app = FastAPI(title="Trip Expense Tracker API")
 
@@ -18,26 +19,183 @@ app.add_middleware(
 )
 
 # Database setup
-DB_FILE = "expenses.db"
+DB_FILE = os.environ.get("EXPENSES_DB", "expenses.db")
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schema.sql")
 
 def get_db():
     conn = sqlite3.connect(DB_FILE, check_same_thread=False)
     conn.row_factory = sqlite3.Row
     return conn
 
+# Every write that can change a group's balances bumps groups.version in the
+# same transaction, so the version is exact even for writes from other
+# processes or made directly against the database.
+GROUP_VERSION_SQL = """
+CREATE INDEX IF NOT EXISTS idx_expenses_group ON expenses (group_id);
+CREATE INDEX IF NOT EXISTS idx_group_members_user ON group_members (user_id);
+
+CREATE TRIGGER IF NOT EXISTS expenses_insert_version AFTER INSERT ON expenses BEGIN
+    UPDATE groups SET version = version + 1 WHERE id = NEW.group_id;
+END;
+CREATE TRIGGER IF NOT EXISTS expenses_update_version AFTER UPDATE ON expenses BEGIN
+    UPDATE groups SET version = version + 1 WHERE id IN (OLD.group_id, NEW.group_id);
+END;
+CREATE TRIGGER IF NOT EXISTS expenses_delete_version AFTER DELETE ON expenses BEGIN
+    UPDATE groups SET version = version + 1 WHERE id = OLD.group_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS participants_insert_version AFTER INSERT ON expense_participants BEGIN
+    UPDATE groups SET version = version + 1
+    WHERE id = (SELECT group_id FROM expenses WHERE id = NEW.expense_id);
+END;
+CREATE TRIGGER IF NOT EXISTS participants_update_version AFTER UPDATE ON expense_participants BEGIN
+    UPDATE groups SET version = version + 1
+    WHERE id IN (SELECT group_id FROM expenses WHERE id IN (OLD.expense_id, NEW.expense_id));
+END;
+CREATE TRIGGER IF NOT EXISTS participants_delete_version AFTER DELETE ON expense_participants BEGIN
+    UPDATE groups SET version = version + 1
+    WHERE id = (SELECT group_id FROM expenses WHERE id = OLD.expense_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS members_insert_version AFTER INSERT ON group_members BEGIN
+    UPDATE groups SET version = version + 1 WHERE id = NEW.group_id;
+END;
+CREATE TRIGGER IF NOT EXISTS members_update_version AFTER UPDATE ON group_members BEGIN
+    UPDATE groups SET version = version + 1 WHERE id IN (OLD.group_id, NEW.group_id);
+END;
+CREATE TRIGGER IF NOT EXISTS members_delete_version AFTER DELETE ON group_members BEGIN
+    UPDATE groups SET version = version + 1 WHERE id = OLD.group_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_update_version AFTER UPDATE OF name ON users BEGIN
+    UPDATE groups SET version = version + 1
+    WHERE id IN (SELECT group_id FROM group_members WHERE user_id = NEW.id);
+END;
+"""
+
 def init_db():
     """Initialize database with schema"""
     if not os.path.exists(DB_FILE):
         conn = get_db()
-        with open("schema.sql", "r") as f:
+        with open(SCHEMA_FILE, "r") as f:
             conn.executescript(f.read())
         conn.commit()
         conn.close()
         print("Database initialized with sample data!")
+    
+    # Add group versioning to databases created before it existed
+    conn = get_db()
+    try:
+        columns = [row["name"] for row in conn.execute("PRAGMA table_info(groups)")]
+        if "version" not in columns:
+            conn.execute("ALTER TABLE groups ADD COLUMN version INTEGER DEFAULT 0")
+        conn.executescript(GROUP_VERSION_SQL)
+        conn.commit()
+    finally:
+        conn.close()
 
 # Initialize database on startup
 init_db()
 
+# Balance coalescing
+MAX_CACHED_GROUPS = 256
+
+def get_group_version(group_id: int) -> int:
+    """Get a group's data version, or -1 if the group does not exist"""
+    conn = get_db()
+    try:
+        row = conn.execute("SELECT version FROM groups WHERE id = ?", (group_id,)).fetchone()
+        return row["version"] if row is not None else -1
+    finally:
+        conn.close()
+
+class _Flight:
+    """A balance computation that is currently running"""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class BalanceCoalescer:
+    """Run at most one balance computation per (group_id, version) at a time.
+
+    Callers that arrive while a computation is running wait for it instead of
+    scanning the group again; the latest result per group is kept until the
+    group's version moves on.
+    """
+    def __init__(self, max_groups: int = MAX_CACHED_GROUPS):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[tuple, _Flight] = {}
+        self._results: Dict[int, tuple] = {}
+        self._max_groups = max_groups
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, group_id: int, version: int, compute):
+        """Return the group's result for this version, computing it at most once"""
+        key = (group_id, version)
+        with self._lock:
+            cached = self._results.get(group_id)
+            if cached is not None:
+                if cached[0] == version:
+                    self.hits += 1
+                    return cached[1]
+                if cached[0] < version:
+                    # The group has changed since this result was computed
+                    del self._results[group_id]
+            flight = self._in_flight.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                flight = _Flight()
+                self._in_flight[key] = flight
+                self.misses += 1
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise RuntimeError(f"Balance computation for group {group_id} failed") from flight.error
+            return flight.result
+
+        try:
+            flight.result = compute()
+        except BaseException as e:
+            flight.error = e
+            raise
+        else:
+            self._store(group_id, version, flight.result)
+            return flight.result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            flight.done.set()
+
+    def _store(self, group_id: int, version: int, result):
+        """Keep a computed result, skipping groups with no members"""
+        net_balances, user_names = result
+        if not user_names:
+            return
+        with self._lock:
+            cached = self._results.get(group_id)
+            if cached is not None and cached[0] >= version:
+                # A result at least this new was stored while this one was computing
+                return
+            self._results.pop(group_id, None)
+            if len(self._results) >= self._max_groups:
+                # Drop the group that was stored longest ago
+                del self._results[next(iter(self._results))]
+            self._results[group_id] = (version, result)
+
+    def stats(self) -> Dict[str, int]:
+        """Get hit, miss and coalesced counts"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced}
+
+balance_coalescer = BalanceCoalescer()
+
 # Pydantic models
 class User(BaseModel):
     id: int
@@ -78,6 +236,11 @@ class GroupBalance(BaseModel):
     net: float
     detail: List[BalanceDetail] = []
 
+class BalanceStats(BaseModel):
+    hits: int
+    misses: int
+    coalesced: int
+
 class BalanceLine(BaseModel):
     groupId: int
     groupName: str
@@ -311,12 +474,10 @@ def delete_expense(expense_id: int):
 
 # MARK: - Balances
 
-@app.get("/balances/group/{group_id}", response_model=GroupBalance)
-def get_group_balance(group_id: int, userId: int):
-    """Get balance for a user within a specific group"""
+def compute_group_net_balances(group_id: int):
+    """Calculate net balances for all users in a group"""
     conn = get_db()
     try:
-        # Calculate net balances for all users in the group
         net_balances = {}
         user_names = {}
         
@@ -358,32 +519,53 @@ def get_group_balance(group_id: int, userId: int):
                 if participant_id != expense["paid_by"]:
                     net_balances[participant_id] -= share
         
-        # Get the requested user's net balance
-        user_net = net_balances.get(userId, 0.0)
-        
-        # Build detail showing what this user owes/is owed by others
-        detail = []
-        for other_id, other_name in user_names.items():
-            if other_id != userId:
-                other_net = net_balances.get(other_id, 0.0)
-                
-                # Calculate pairwise debt between user and other
-                if user_net < 0 and other_net > 0:
-                    # User owes money, other is owed money
-                    amount_owed = min(abs(user_net), other_net)
-                    if amount_owed > 0.01:
-                        detail.append(BalanceDetail(counterparty=other_name, amount=-amount_owed))
-                elif user_net > 0 and other_net < 0:
-                    # User is owed money, other owes money
-                    amount_owed = min(user_net, abs(other_net))
-                    if amount_owed > 0.01:
-                        detail.append(BalanceDetail(counterparty=other_name, amount=amount_owed))
-        
-        return GroupBalance(net=round(user_net, 2), detail=detail)
+        return net_balances, user_names
         
     finally:
         conn.close()
 
+def project_group_balance(group_id: int, user_id: int, version: int) -> GroupBalance:
+    """Build one user's view of a group's shared net balances"""
+    # Concurrent callers for the same group share one computation
+    net_balances, user_names = balance_coalescer.get(
+        group_id,
+        version,
+        lambda: compute_group_net_balances(group_id)
+    )
+    
+    # Get the requested user's net balance
+    user_net = net_balances.get(user_id, 0.0)
+    
+    # Build detail showing what this user owes/is owed by others
+    detail = []
+    for other_id, other_name in user_names.items():
+        if other_id != user_id:
+            other_net = net_balances.get(other_id, 0.0)
+            
+            # Calculate pairwise debt between user and other
+            if user_net < 0 and other_net > 0:
+                # User owes money, other is owed money
+                amount_owed = min(abs(user_net), other_net)
+                if amount_owed > 0.01:
+                    detail.append(BalanceDetail(counterparty=other_name, amount=-amount_owed))
+            elif user_net > 0 and other_net < 0:
+                # User is owed money, other owes money
+                amount_owed = min(user_net, abs(other_net))
+                if amount_owed > 0.01:
+                    detail.append(BalanceDetail(counterparty=other_name, amount=amount_owed))
+    
+    return GroupBalance(net=round(user_net, 2), detail=detail)
+
+@app.get("/balances/group/{group_id}", response_model=GroupBalance)
+def get_group_balance(group_id: int, userId: int):
+    """Get balance for a user within a specific group"""
+    return project_group_balance(group_id, userId, get_group_version(group_id))
+
+@app.get("/balances/stats", response_model=BalanceStats)
+def get_balance_stats():
+    """Get hit, miss and coalesced counts for balance computations"""
+    return balance_coalescer.stats()
+
 @app.get("/balances/user/{user_id}", response_model=List[BalanceLine])
 def get_user_balance(user_id: int, status: str = 'active'):  # ← Add status parameter
     """Get overall balance for a user across all groups"""
@@ -391,7 +573,7 @@ def get_user_balance(user_id: int, status: str = 'active'):  # ← Add status pa
     try:
         # Get groups filtered by status
         groups = conn.execute(
-            """SELECT g.id, g.name FROM groups g 
+            """SELECT g.id, g.name, g.version FROM groups g 
                JOIN group_members gm ON g.id = gm.group_id 
                WHERE gm.user_id = ? AND g.status = ?""",  # ← Add status filter
             (user_id, status)
@@ -404,7 +586,7 @@ def get_user_balance(user_id: int, status: str = 'active'):  # ← Add status pa
             group_name = group["name"]
             
             # Get group balance for this user
-            group_balance = get_group_balance(group_id, user_id)
+            group_balance = project_group_balance(group_id, user_id, group["version"])
             
             # Create summary line for this group
             if abs(group_balance.net) > 0.01:
@@ -135,6 +135,44 @@ def test_user_balance(user_id: int):
         print_test(f"Overall balance for user {user_id}", False, str(e))
         return False
 
+def get_group_net(group_id: int, user_id: int):
+    """Read a user's net balance in a group"""
+    try:
+        response = requests.get(f"{BASE_URL}/balances/group/{group_id}?userId={user_id}")
+        return response.json()["net"] if response.status_code == 200 else None
+    except Exception:
+        return None
+
+def test_balance_refresh(net_before, net_after_add, net_after_delete):
+    """Test that balances reflect an added and then deleted expense"""
+    success = (
+        net_before is not None
+        and net_after_add is not None
+        and net_after_add != net_before
+        and net_after_delete == net_before
+    )
+    print_test("Balance refresh after add/delete", success, {
+        "before": net_before,
+        "after_add": net_after_add,
+        "after_delete": net_after_delete
+    })
+    return success
+
+def test_balance_stats():
+    """Test getting balance computation stats"""
+    try:
+        response = requests.get(f"{BASE_URL}/balances/stats")
+        data = response.json()
+        success = (
+            response.status_code == 200
+            and all(isinstance(data.get(k), int) for k in ("hits", "misses", "coalesced"))
+        )
+        print_test("Balance stats", success, data)
+        return success
+    except Exception as e:
+        print_test("Balance stats", False, str(e))
+        return False
+
 def test_create_group():
     """Test creating a new group"""
     try:
@@ -190,16 +228,22 @@ def main():
     # Test adding an expense
     if members and len(members) >= 2:
         participant_ids = [m["id"] for m in members]
-        expense_id = test_add_expense(group_id, members[0]["id"], participant_ids)
+        payer_id = members[0]["id"]
+        net_before = get_group_net(group_id, payer_id)
+        expense_id = test_add_expense(group_id, payer_id, participant_ids)
         
         # Test deleting the expense we just created
         if expense_id:
+            net_after_add = get_group_net(group_id, payer_id)
             test_delete_expense(expense_id)
+            net_after_delete = get_group_net(group_id, payer_id)
+            test_balance_refresh(net_before, net_after_add, net_after_delete)
     
     # Test balances
     user_id = users[0]["id"]  # Andy
     test_group_balance(group_id, user_id)
     test_user_balance(user_id)
+    test_balance_stats()
     
     # Test creating a new group
     new_group_id = test_create_group()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Balance Coalescing Tests for Trip Expense Tracker
+Exercises BalanceCoalescer and group versioning directly, no server needed
+Run with: python test_coalescer.py  (or pytest)
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+# Point the API at a scratch database before main runs init_db on import
+TEST_DIR = tempfile.TemporaryDirectory()
+os.environ["EXPENSES_DB"] = os.path.join(TEST_DIR.name, "test.db")
+
+import main
+
+CALLERS = 8
+
+def group_result(*user_ids):
+    """A stub compute result for a group with these members"""
+    return {u: 0.0 for u in user_ids}, {u: f"User {u}" for u in user_ids}
+
+def wait_for(condition, timeout: float = 5.0):
+    """Poll until condition() is true"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out waiting for condition")
+        time.sleep(0.001)
+
+def run_concurrently(coalescer, compute, callers: int = CALLERS):
+    """Call coalescer.get from `callers` threads at once, return (results, errors)"""
+    barrier = threading.Barrier(callers)
+    results, errors = [], []
+
+    def worker():
+        barrier.wait()
+        try:
+            results.append(coalescer.get(1, 0, compute))
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(callers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+def test_concurrent_callers_share_one_computation():
+    """Concurrent callers for one version run compute once"""
+    coalescer = main.BalanceCoalescer()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        # Hold the computation until every other caller is waiting on it
+        wait_for(lambda: coalescer.coalesced == CALLERS - 1)
+        return group_result(1, 2)
+
+    results, errors = run_concurrently(coalescer, compute)
+    assert not errors
+    assert len(calls) == 1
+    assert len(results) == CALLERS and all(r is results[0] for r in results)
+    assert coalescer.stats() == {"hits": 0, "misses": 1, "coalesced": CALLERS - 1}
+
+    # The result is reused until the version changes
+    assert coalescer.get(1, 0, compute) is results[0]
+    assert coalescer.stats()["hits"] == 1
+
+def test_waiters_get_chained_error():
+    """Waiters raise a new RuntimeError chained to the leader's error"""
+    coalescer = main.BalanceCoalescer()
+    failure = ValueError("scan failed")
+
+    def compute():
+        wait_for(lambda: coalescer.coalesced == CALLERS - 1)
+        raise failure
+
+    results, errors = run_concurrently(coalescer, compute)
+    assert not results
+    assert sum(e is failure for e in errors) == 1
+    waiter_errors = [e for e in errors if e is not failure]
+    assert len(waiter_errors) == CALLERS - 1
+    assert all(isinstance(e, RuntimeError) and e.__cause__ is failure for e in waiter_errors)
+    assert len(set(map(id, waiter_errors))) == CALLERS - 1
+
+def test_waiters_get_error_on_base_exception():
+    """Waiters fail cleanly when the leader is interrupted"""
+    coalescer = main.BalanceCoalescer()
+
+    def compute():
+        wait_for(lambda: coalescer.coalesced == CALLERS - 1)
+        raise KeyboardInterrupt
+
+    results, errors = run_concurrently(coalescer, compute)
+    assert not results
+    assert sum(isinstance(e, KeyboardInterrupt) for e in errors) == 1
+    assert sum(isinstance(e, RuntimeError) for e in errors) == CALLERS - 1
+
+def test_empty_group_not_cached():
+    """Groups with no members are computed but never kept"""
+    coalescer = main.BalanceCoalescer()
+    for group_id in range(100):
+        coalescer.get(group_id, -1, lambda: group_result())
+    assert coalescer._results == {}
+
+def test_cache_evicts_oldest_group():
+    """The cache holds at most max_groups groups"""
+    coalescer = main.BalanceCoalescer()
+    for group_id in range(main.MAX_CACHED_GROUPS + 10):
+        coalescer.get(group_id, 0, lambda: group_result(1))
+    assert len(coalescer._results) == main.MAX_CACHED_GROUPS
+    assert 0 not in coalescer._results
+    assert main.MAX_CACHED_GROUPS + 9 in coalescer._results
+
+def test_older_version_keeps_newer_result():
+    """A caller with an older version does not replace a newer result"""
+    coalescer = main.BalanceCoalescer()
+    newer = group_result(1, 2)
+    coalescer.get(1, 2, lambda: newer)
+    coalescer.get(1, 1, lambda: group_result(1))
+    assert coalescer._results[1] == (2, newer)
+
+    # A newer version replaces it
+    newest = group_result(1, 3)
+    coalescer.get(1, 3, lambda: newest)
+    assert coalescer._results[1] == (3, newest)
+
+def test_direct_writes_refresh_balance():
+    """Writes made straight to the database bump the group's version"""
+    main.balance_coalescer = main.BalanceCoalescer()
+    assert main.get_group_balance(1, 1).net == 65.0
+    assert main.get_group_balance(1, 1).net == 65.0
+    assert main.balance_coalescer.stats()["hits"] == 1
+
+    conn = sqlite3.connect(main.DB_FILE)
+    try:
+        conn.execute("UPDATE expenses SET paid_by = 2 WHERE id = 1")
+        conn.execute("UPDATE users SET name = 'Trin' WHERE id = 2")
+        conn.commit()
+    finally:
+        conn.close()
+
+    balance = main.get_group_balance(1, 1)
+    assert balance.net == -55.0
+    assert [d.counterparty for d in balance.detail] == ["Trin"]
+
+def main_tests():
+    """Run all coalescing tests"""
+    print("🚀 Starting Balance Coalescing Tests")
+    print("=" * 50)
+    print()
+
+    tests = [
+        test_concurrent_callers_share_one_computation,
+        test_waiters_get_chained_error,
+        test_waiters_get_error_on_base_exception,
+        test_empty_group_not_cached,
+        test_cache_evicts_oldest_group,
+        test_older_version_keeps_newer_result,
+        test_direct_writes_refresh_balance,
+    ]
+    for test in tests:
+        try:
+            test()
+            print(f"✅ PASS {test.__doc__}")
+        except Exception as e:
+            print(f"❌ FAIL {test.__doc__}: {e!r}")
+    print()
+    print("=" * 50)
+    print("🏁 Balance Coalescing Tests Complete!")
+
+if __name__ == "__main__":
+    try:
+        main_tests()
+    finally:
+        TEST_DIR.cleanup()